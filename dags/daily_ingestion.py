@@ -5,6 +5,7 @@ import sys
 
 sys.path.append('./opt/airflow')
 from data.fetch_live_stocks import run_daily_batch
+from data.export_parquet_snapshot import run_snapshot_export
 
 default_args = {
     'owner': 'adam',
@@ -29,4 +30,9 @@ with DAG(
         python_callable=run_daily_batch
     )
 
-    ingest_task
\ No newline at end of file
+    snapshot_task = PythonOperator(
+        task_id='run_snapshot_export',
+        python_callable=run_snapshot_export
+    )
+
+    ingest_task >> snapshot_task
\ No newline at end of file
@@ -0,0 +1,244 @@
+import hashlib
+import json
+import os
+import shutil
+from datetime import date, datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+load_dotenv()
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MANIFEST = '_manifest.json'
+
+# Ligne de fait dénormalisée : attributs stables du ticker + calendrier.
+# `year` n'est pas stocké dans les fichiers, il vient du partitionnement hive.
+FACT_SCHEMA = pa.schema([
+    ('symbol', pa.string()),
+    ('date', pa.date32()),
+    ('open_price', pa.float64()),
+    ('high_price', pa.float64()),
+    ('low_price', pa.float64()),
+    ('close_price', pa.float64()),
+    ('volume', pa.int64()),
+    ('adj_close', pa.float64()),
+    ('volatility', pa.float64()),
+    ('name', pa.string()),
+    ('market', pa.string()),
+    ('sector', pa.string()),
+    ('month', pa.int32()),
+    ('quarter', pa.int32()),
+    ('day_of_week', pa.int32()),
+    ('is_weekend', pa.bool_()),
+    ('is_month_end', pa.bool_()),
+])
+PARTITIONING = ds.partitioning(pa.schema([('year', pa.int32())]), flavor='hive')
+
+
+def get_engine():
+    # Créé à la demande : les lecteurs du snapshot n'ont pas besoin de la config Postgres
+    return create_engine(f"postgresql+psycopg2://{os.getenv('PGUSER')}:{os.getenv('PGPASSWORD')}@{os.getenv('PGHOST')}:{os.getenv('PGPORT')}/{os.getenv('PGDATABASE')}")
+
+def snapshot_dir() -> str:
+    # Résolu à l'appel ; un SNAPSHOT_DIR relatif part de la racine du repo, pas du cwd
+    return os.path.join(REPO_ROOT, os.getenv('SNAPSHOT_DIR') or 'snapshots')
+
+
+def list_year_partitions(engine) -> dict[int, str]:
+    q = text("""
+    SELECT c.relname
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    JOIN pg_class p ON p.oid = i.inhparent
+    WHERE p.relname = 'fact_ohlcv'
+    """)
+    with engine.begin() as conn:
+        names = conn.execute(q).scalars().all()
+    return {int(n.rsplit('_', 1)[1]): n for n in names if n.rsplit('_', 1)[1].isdigit()}
+
+def tickers_fingerprint(engine) -> str:
+    # Seuls les attributs dénormalisés comptent : last_date/avg_volume bougent à chaque batch
+    q = text('SELECT symbol, name, market, sector FROM dim_tickers ORDER BY symbol')
+    with engine.begin() as conn:
+        rows = conn.execute(q).all()
+    return hashlib.md5(repr([tuple(r) for r in rows]).encode()).hexdigest()
+
+def partition_fingerprints(engine, partitions: dict[int, str]) -> dict[int, str]:
+    # count(*)/max(date) lus sur l'index (date, symbol) : exacts et synchrones, ils couvrent
+    # les insertions et suppressions. Les UPDATE en place ne sont vus que via les compteurs
+    # pg_stat, publiés en asynchrone (jusqu'à ~10 s en PG15) : un UPDATE tout juste commité
+    # peut donc n'être exporté qu'au run suivant.
+    q = text("""
+    SELECT relname, n_tup_ins, n_tup_upd, n_tup_del
+    FROM pg_stat_user_tables
+    WHERE relname = ANY(:names)
+    """)
+    fingerprints = {}
+    with engine.begin() as conn:
+        stats = {r.relname: r for r in conn.execute(q, {"names": list(partitions.values())})}
+        for year, relname in partitions.items():
+            count, max_date = conn.execute(text(f'SELECT COUNT(*), MAX(date) FROM {relname}')).one()
+            r = stats.get(relname)
+            counters = 'none' if r is None else f"{r.n_tup_ins}:{r.n_tup_upd}:{r.n_tup_del}"
+            fingerprints[year] = f"{count}:{max_date}:{counters}"
+    return fingerprints
+
+def load_manifest(root: str) -> dict:
+    path = os.path.join(root, MANIFEST)
+    if not os.path.exists(path):
+        return {'tickers': None, 'partitions': {}}
+    with open(path) as f:
+        return json.load(f)
+
+def save_manifest(root: str, manifest: dict):
+    path = os.path.join(root, MANIFEST)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+def read_partition(engine, relname: str) -> pa.Table:
+    # Lecture directe de la partition fille : Postgres ne touche pas aux autres années
+    q = f"""
+    SELECT
+        f.symbol, f.date,
+        f.open_price::float8 AS open_price,
+        f.high_price::float8 AS high_price,
+        f.low_price::float8 AS low_price,
+        f.close_price::float8 AS close_price,
+        f.volume,
+        f.adj_close::float8 AS adj_close,
+        f.volatility::float8 AS volatility,
+        t.name, t.market, t.sector,
+        d.month, d.quarter, d.day_of_week, d.is_weekend, d.is_month_end
+    FROM {relname} f
+    JOIN dim_tickers t ON t.symbol = f.symbol
+    JOIN dimtime d ON d.date = f.date
+    ORDER BY f.symbol, f.date
+    """
+    df = pd.read_sql(q, engine)
+    df['date'] = pd.to_datetime(df['date']).dt.date
+    return pa.Table.from_pandas(df, schema=FACT_SCHEMA, preserve_index=False)
+
+def write_table(table: pa.Table, path: str, row_group_size: int = 64_000):
+    # Écriture atomique : le fichier temporaire commence par '.', ignoré par la découverte
+    # du dataset, donc un lecteur ne voit jamais de fichier à moitié écrit.
+    # Trié par (symbol, date), les stats min/max des row groups servent au pushdown.
+    dirname, basename = os.path.split(path)
+    os.makedirs(dirname, exist_ok=True)
+    tmp = os.path.join(dirname, '.' + basename + '.tmp')
+    pq.write_table(table, tmp, compression='zstd', row_group_size=row_group_size, write_statistics=True)
+    os.replace(tmp, path)
+
+def export_dimensions(engine, root: str):
+    tickers = pd.read_sql('SELECT symbol, name, market, sector, first_date, last_date, avg_volume FROM dim_tickers ORDER BY symbol', engine)
+    write_table(pa.Table.from_pandas(tickers, preserve_index=False), os.path.join(root, 'dim_tickers', 'part-0.parquet'))
+
+    dimtime = pd.read_sql('SELECT date, year, month, day, quarter, day_of_week, is_weekend, is_month_end FROM dimtime ORDER BY date', engine)
+    dimtime['date'] = pd.to_datetime(dimtime['date']).dt.date
+    write_table(pa.Table.from_pandas(dimtime, preserve_index=False), os.path.join(root, 'dimtime', 'part-0.parquet'))
+
+def drop_stale_years(root: str, manifest: dict, partitions: dict[int, str]) -> list[int]:
+    # Partition supprimée/détachée côté Postgres : son dossier ne doit plus être scanné
+    fact_dir = os.path.join(root, 'fact_ohlcv')
+    on_disk = set()
+    if os.path.isdir(fact_dir):
+        for entry in os.listdir(fact_dir):
+            key, _, value = entry.partition('=')
+            if key == 'year' and value.isdigit():
+                on_disk.add(int(value))
+    known = {int(y) for y in manifest['partitions']}
+
+    stale = sorted((on_disk | known) - set(partitions))
+    for year in stale:
+        shutil.rmtree(os.path.join(fact_dir, f'year={year}'), ignore_errors=True)
+        manifest['partitions'].pop(str(year), None)
+        print(f"fact_ohlcv_{year}: no longer in source, removed from snapshot")
+    return stale
+
+def run_snapshot_export(root: str | None = None, force: bool = False) -> list[int]:
+    root = root or snapshot_dir()
+    engine = get_engine()
+    os.makedirs(root, exist_ok=True)
+    manifest = load_manifest(root)
+
+    partitions = list_year_partitions(engine)
+    fingerprints = partition_fingerprints(engine, partitions)
+    tickers_fp = tickers_fingerprint(engine)
+    # Un changement de nom/marché/secteur invalide toutes les partitions dénormalisées
+    tickers_changed = force or manifest.get('tickers') != tickers_fp
+
+    export_dimensions(engine, root)
+    drop_stale_years(root, manifest, partitions)
+
+    exported = []
+    for year in sorted(partitions):
+        previous = manifest['partitions'].get(str(year))
+        target = os.path.join(root, 'fact_ohlcv', f'year={year}', 'part-0.parquet')
+        if not tickers_changed and previous == fingerprints[year] and os.path.exists(target):
+            print(f"{partitions[year]}: unchanged, skipped")
+            continue
+
+        table = read_partition(engine, partitions[year])
+        write_table(table, target)
+        manifest['partitions'][str(year)] = fingerprints[year]
+        exported.append(year)
+        print(f"{partitions[year]}: exported {table.num_rows} rows -> {target}")
+
+    manifest['tickers'] = tickers_fp
+    manifest['exported_at'] = datetime.now().isoformat(timespec='seconds')
+    save_manifest(root, manifest)
+    return exported
+
+
+def open_fact_dataset(root: str | None = None) -> ds.Dataset:
+    # use_mmap : lectures via mmap plutôt que des appels read(). Les pages zstd sont tout
+    # de même décompressées et décodées dans de nouveaux buffers Arrow à chaque scan.
+    return ds.dataset(
+        os.path.abspath(os.path.join(root or snapshot_dir(), 'fact_ohlcv')),
+        format='parquet',
+        partitioning=PARTITIONING,
+        filesystem=fs.LocalFileSystem(use_mmap=True),
+        ignore_prefixes=['.', '_'],
+    )
+
+def build_filter(symbols: str | list[str] | None = None, start: date | None = None, end: date | None = None) -> ds.Expression | None:
+    expr = None
+
+    def _and(e):
+        return e if expr is None else expr & e
+
+    if symbols:
+        symbols = [symbols] if isinstance(symbols, str) else list(symbols)
+        expr = _and(ds.field('symbol').isin(symbols))
+    # Filtre sur `year` en plus de `date` : élagage des répertoires avant toute lecture
+    if start is not None:
+        expr = _and((ds.field('year') >= start.year) & (ds.field('date') >= start))
+    if end is not None:
+        expr = _and((ds.field('year') <= end.year) & (ds.field('date') <= end))
+    return expr
+
+def scan_ohlcv(
+    symbols: str | list[str] | None = None,
+    start: date | None = None,
+    end: date | None = None,
+    columns: list[str] | None = None,
+    root: str | None = None,
+) -> pa.Table:
+    dataset = open_fact_dataset(root)
+    return dataset.to_table(columns=columns, filter=build_filter(symbols, start, end))
+
+def read_dimension(name: str, root: str | None = None) -> pa.Table:
+    if name not in ('dim_tickers', 'dimtime'):
+        raise ValueError(f"Unknown dimension: {name}")
+    return pq.read_table(os.path.join(root or snapshot_dir(), name, 'part-0.parquet'), memory_map=True)
+
+if __name__ == "__main__":
+    exported = run_snapshot_export()
+    print(f"Snapshot {snapshot_dir()}: {len(exported)} partition(s) re-exported {exported}")
@@ -0,0 +1,116 @@
+import os
+import sys
+from datetime import date, timedelta
+
+import pyarrow as pa
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from data import export_parquet_snapshot as snap
+
+
+def make_partition(year: int, symbols=('AAPL', 'MSFT'), days: int = 5) -> pa.Table:
+    rows = []
+    for symbol in symbols:
+        for i in range(days):
+            d = date(year, 1, 2) + timedelta(days=i)
+            rows.append({
+                'symbol': symbol, 'date': d,
+                'open_price': 1.0, 'high_price': 2.0, 'low_price': 0.5, 'close_price': 1.5,
+                'volume': 100, 'adj_close': 1.5, 'volatility': 1.0,
+                'name': symbol, 'market': 'Equity', 'sector': None,
+                'month': d.month, 'quarter': 1, 'day_of_week': d.weekday(),
+                'is_weekend': d.weekday() >= 5, 'is_month_end': False,
+            })
+    return pa.Table.from_pylist(rows, schema=snap.FACT_SCHEMA)
+
+
+@pytest.fixture
+def source(monkeypatch):
+    # Postgres simulé : partitions, empreintes et lectures contrôlées par le test
+    state = {
+        'partitions': {2024: 'fact_ohlcv_2024', 2025: 'fact_ohlcv_2025'},
+        'fingerprints': {2024: '1:0:0:10', 2025: '1:0:0:10'},
+        'tickers': 'fp-1',
+        'reads': [],
+    }
+
+    def read_partition(engine, relname):
+        state['reads'].append(relname)
+        return make_partition(int(relname.rsplit('_', 1)[1]))
+
+    monkeypatch.setattr(snap, 'get_engine', lambda: None)
+    monkeypatch.setattr(snap, 'list_year_partitions', lambda engine: dict(state['partitions']))
+    monkeypatch.setattr(snap, 'partition_fingerprints', lambda engine, partitions: {y: state['fingerprints'][y] for y in partitions})
+    monkeypatch.setattr(snap, 'tickers_fingerprint', lambda engine: state['tickers'])
+    monkeypatch.setattr(snap, 'export_dimensions', lambda engine, root: None)
+    monkeypatch.setattr(snap, 'read_partition', read_partition)
+    return state
+
+
+def test_unchanged_partitions_are_skipped(source, tmp_path):
+    assert snap.run_snapshot_export(str(tmp_path)) == [2024, 2025]
+    assert snap.run_snapshot_export(str(tmp_path)) == []
+
+    source['fingerprints'][2025] = '2:0:0:11'
+    assert snap.run_snapshot_export(str(tmp_path)) == [2025]
+
+
+def test_tickers_change_reexports_everything(source, tmp_path):
+    snap.run_snapshot_export(str(tmp_path))
+    source['tickers'] = 'fp-2'
+    assert snap.run_snapshot_export(str(tmp_path)) == [2024, 2025]
+
+
+def test_force_reexports_everything(source, tmp_path):
+    snap.run_snapshot_export(str(tmp_path))
+    assert snap.run_snapshot_export(str(tmp_path), force=True) == [2024, 2025]
+
+
+def test_dropped_partition_is_removed(source, tmp_path):
+    snap.run_snapshot_export(str(tmp_path))
+    del source['partitions'][2024]
+    snap.run_snapshot_export(str(tmp_path))
+
+    assert not os.path.exists(tmp_path / 'fact_ohlcv' / 'year=2024')
+    assert '2024' not in snap.load_manifest(str(tmp_path))['partitions']
+    assert set(snap.scan_ohlcv(root=str(tmp_path)).column('year').to_pylist()) == {2025}
+
+
+def test_scan_filters_symbol_and_date(source, tmp_path):
+    snap.run_snapshot_export(str(tmp_path))
+
+    assert snap.scan_ohlcv(root=str(tmp_path)).num_rows == 20
+
+    table = snap.scan_ohlcv(['MSFT'], start=date(2025, 1, 3), end=date(2025, 1, 4), root=str(tmp_path))
+    assert table.num_rows == 2
+    assert set(table.column('symbol').to_pylist()) == {'MSFT'}
+    assert set(table.column('year').to_pylist()) == {2025}
+
+
+def test_scan_accepts_single_symbol_string(source, tmp_path):
+    snap.run_snapshot_export(str(tmp_path))
+    table = snap.scan_ohlcv('AAPL', root=str(tmp_path))
+    assert table.num_rows == 10
+
+
+def test_scan_ignores_temporary_files(source, tmp_path):
+    snap.run_snapshot_export(str(tmp_path))
+    # Export interrompu : fichier temporaire tronqué laissé dans la partition
+    tmp = tmp_path / 'fact_ohlcv' / 'year=2024' / '.part-0.parquet.tmp'
+    tmp.write_bytes(b'PAR1 truncated')
+    assert snap.scan_ohlcv(root=str(tmp_path)).num_rows == 20
+
+
+def test_corrupt_partition_raises(source, tmp_path):
+    snap.run_snapshot_export(str(tmp_path))
+    (tmp_path / 'fact_ohlcv' / 'year=2024' / 'part-0.parquet').write_bytes(b'not parquet')
+    with pytest.raises(pa.ArrowInvalid):
+        snap.scan_ohlcv(root=str(tmp_path))
+
+
+def test_snapshot_dir_resolved_at_call_time(monkeypatch, tmp_path):
+    monkeypatch.setenv('SNAPSHOT_DIR', str(tmp_path))
+    assert snap.snapshot_dir() == str(tmp_path)
+    monkeypatch.setenv('SNAPSHOT_DIR', 'snaps')
+    assert snap.snapshot_dir() == os.path.join(snap.REPO_ROOT, 'snaps')